@@ -13,13 +13,8 @@ WINDOW="$1"
 shift  # Remove first argument, rest is the message
 MESSAGE="$*"
 
-# Send the message
-tmux send-keys -t "$WINDOW" "$MESSAGE"
-
-# Wait 0.5 seconds for UI to register
-sleep 0.5
-
-# Send Enter to submit
-tmux send-keys -t "$WINDOW" Enter
+# Send the message, pause 0.5 seconds for the UI to register it, then send
+# Enter to submit - all in a single tmux client invocation
+tmux send-keys -t "$WINDOW" "$MESSAGE" \; run-shell 'sleep 0.5' \; send-keys -t "$WINDOW" Enter
 
 echo "Message sent to $WINDOW: $MESSAGE"
\ No newline at end of file
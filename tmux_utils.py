@@ -1,20 +1,32 @@
 #!/usr/bin/env python3
 
+import re
 import subprocess
-import json
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 
-@dataclass
+# Snapshot separators built once instead of re-multiplied per call
+_SNAPSHOT_HEADER = "=" * 50 + "\n\n"
+_SESSION_SEP = "-" * 30 + "\n"
+
+# Private session the control-mode client attaches to, so it never marks a
+# user session as attached or subscribes to its %output stream. Hidden from
+# get_tmux_sessions listings.
+_CONTROL_SESSION = "_tmux_utils_control"
+
+@dataclass(slots=True)
 class TmuxWindow:
     session_name: str
     window_index: int
     window_name: str
     active: bool
     
-@dataclass
+@dataclass(slots=True)
 class TmuxSession:
     name: str
     windows: List[TmuxWindow]
@@ -24,77 +36,258 @@ class TmuxOrchestrator:
     def __init__(self):
         self.safety_mode = True
         self.max_lines_capture = 1000
+        # (session, window) -> (screen fingerprint, content) so unchanged
+        # windows can skip the capture-pane subprocess entirely
+        self._window_history: Dict[Tuple[str, int], Tuple[Tuple, str]] = {}
+        # Persistent control-mode (tmux -C) connection; spawned lazily so
+        # read-heavy commands don't pay a fork+exec per call
+        self._control_proc: Optional[subprocess.Popen] = None
+        self._control_lock = threading.Lock()
+        # Session topology cached briefly so back-to-back lookups (snapshot
+        # plus find_window_by_name in the same beat) don't re-list everything
+        self._sessions_cache: Optional[Tuple[float, List[TmuxSession]]] = None
+        self._sessions_cache_ttl = 0.5
+
+    def _ensure_control_connection(self) -> Optional[subprocess.Popen]:
+        """Lazily attach a control-mode tmux client, respawning it if the
+        previous one died. Returns None when tmux is unavailable."""
+        if self._control_proc is not None and self._control_proc.poll() is None:
+            return self._control_proc
+
+        try:
+            # Attach to (or create) a dedicated detached session rather than
+            # hijacking a user session: attaching there would flip its
+            # session_attached flag and stream its %output into our pipe
+            proc = subprocess.Popen(
+                ["tmux", "-C", "new-session", "-A", "-s", _CONTROL_SESSION],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL, text=True, bufsize=1
+            )
+        except OSError:
+            return None
+
+        try:
+            # Consume the reply block the initial attach emits so the next
+            # command reads its own reply
+            self._read_control_reply(proc)
+        except OSError:
+            # No server running (or attach refused) - fall back to one-shot
+            # subprocess calls until a later command retries
+            proc.terminate()
+            return None
+
+        self._control_proc = proc
+        return proc
+
+    def _read_control_reply(self, proc: subprocess.Popen) -> Optional[str]:
+        """Read one %begin/%end framed reply, skipping async notifications.
+        Returns None when the command reported %error.
+
+        Captured pane content can itself contain lines that look like
+        protocol markers, so the block only ends on an %end/%error whose
+        <time> <cmdnum> fields match the opening %begin - everything else
+        inside the block is payload."""
+        while True:
+            line = proc.stdout.readline()
+            if line == '':
+                raise OSError("control-mode connection closed")
+            line = line.rstrip('\n')
+            if line.startswith('%begin '):
+                reply_id = line.split(' ')[1:3]
+                if len(reply_id) == 2:
+                    break
+            # Anything else is an async notification (%output, %window-add,
+            # %session-changed, ...) - ignore it
+
+        output_lines = []
+        while True:
+            line = proc.stdout.readline()
+            if line == '':
+                raise OSError("control-mode connection closed")
+            line = line.rstrip('\n')
+            if line.startswith(('%end ', '%error ')) and line.split(' ')[1:3] == reply_id:
+                if line.startswith('%error '):
+                    return None
+                return '\n'.join(output_lines) + ('\n' if output_lines else '')
+            output_lines.append(line)
+
+    def _control_command(self, command: str) -> Optional[str]:
+        """Run a tmux command over the persistent control-mode connection.
+        Returns its output, or None when the connection is unavailable or
+        the command failed - callers fall back to a one-shot subprocess."""
+        with self._control_lock:
+            proc = self._ensure_control_connection()
+            if proc is None:
+                return None
+            try:
+                proc.stdin.write(command + '\n')
+                proc.stdin.flush()
+                return self._read_control_reply(proc)
+            except (OSError, ValueError):
+                self._close_control_connection()
+                return None
+
+    def _close_control_connection(self):
+        proc = self._control_proc
+        self._control_proc = None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.terminate()
+            proc.wait(timeout=2)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            pass
+
+    def __del__(self):
+        self._close_control_connection()
+
+    @staticmethod
+    def _quote(arg: str) -> str:
+        """Quote an argument for the control-mode command line. tmux parses
+        quotes like a shell, so embedded single quotes are escaped with the
+        usual '\\'' dance - the one-shot argv path needs none of this."""
+        return "'" + arg.replace("'", "'\\''") + "'"
+
+    def _run_tmux(self, args: List[str]) -> str:
+        """Run a one-shot tmux command and return its stdout. close_fds=False
+        keeps CPython on the posix_spawn fast path instead of fork+exec."""
+        result = subprocess.run(["tmux"] + args, capture_output=True, text=True,
+                                close_fds=False, check=True)
+        return result.stdout
         
+    def invalidate_cache(self):
+        """Drop the cached session topology (e.g. after creating windows)"""
+        self._sessions_cache = None
+
     def get_tmux_sessions(self) -> List[TmuxSession]:
         """Get all tmux sessions and their windows"""
+        cached = self._sessions_cache
+        if cached is not None and time.monotonic() - cached[0] < self._sessions_cache_ttl:
+            return cached[1]
+
+        # One list-windows -a call covers every session (each session has at
+        # least one window), instead of list-sessions plus one list-windows
+        # per session. Fields are joined with \x1f, which unlike ':' cannot
+        # appear in a window name
+        list_format = "#{session_name}\x1f#{session_attached}\x1f#{window_index}\x1f#{window_name}\x1f#{window_active}"
         try:
-            # Get sessions
-            sessions_cmd = ["tmux", "list-sessions", "-F", "#{session_name}:#{session_attached}"]
-            sessions_result = subprocess.run(sessions_cmd, capture_output=True, text=True, check=True)
-            
-            sessions = []
-            for line in sessions_result.stdout.strip().split('\n'):
+            stdout = self._control_command(f"list-windows -a -F '{list_format}'")
+            if stdout is None:
+                stdout = self._run_tmux(["list-windows", "-a", "-F", list_format])
+
+            sessions: Dict[str, TmuxSession] = {}
+            for line in stdout.splitlines():
                 if not line:
                     continue
-                session_name, attached = line.split(':')
-                
-                # Get windows for this session
-                windows_cmd = ["tmux", "list-windows", "-t", session_name, "-F", "#{window_index}:#{window_name}:#{window_active}"]
-                windows_result = subprocess.run(windows_cmd, capture_output=True, text=True, check=True)
-                
-                windows = []
-                for window_line in windows_result.stdout.strip().split('\n'):
-                    if not window_line:
-                        continue
-                    window_index, window_name, window_active = window_line.split(':')
-                    windows.append(TmuxWindow(
-                        session_name=session_name,
-                        window_index=int(window_index),
-                        window_name=window_name,
-                        active=window_active == '1'
-                    ))
-                
-                sessions.append(TmuxSession(
-                    name=session_name,
-                    windows=windows,
-                    attached=attached == '1'
+                session_name, attached, window_index, window_name, window_active = line.split('\x1f', 4)
+                if session_name == _CONTROL_SESSION:
+                    continue
+
+                session = sessions.get(session_name)
+                if session is None:
+                    session = TmuxSession(
+                        name=session_name,
+                        windows=[],
+                        attached=attached != '0'
+                    )
+                    sessions[session_name] = session
+
+                session.windows.append(TmuxWindow(
+                    session_name=session_name,
+                    window_index=int(window_index),
+                    window_name=window_name,
+                    active=window_active == '1'
                 ))
-            
-            return sessions
+
+            session_list = list(sessions.values())
+            self._sessions_cache = (time.monotonic(), session_list)
+            return session_list
         except subprocess.CalledProcessError as e:
             print(f"Error getting tmux sessions: {e}")
             return []
     
-    def capture_window_content(self, session_name: str, window_index: int, num_lines: int = 50) -> str:
-        """Safely capture the last N lines from a tmux window"""
+    def capture_window_content(self, session_name: str, window_index: int, num_lines: int = 50, streaming: bool = False) -> str:
+        """Safely capture the last N lines from a tmux window.
+
+        With streaming=True the one-shot fallback reads the pipe line by
+        line and keeps only the last num_lines lines, bounding peak memory
+        for deep captures instead of buffering the whole history at once."""
         if num_lines > self.max_lines_capture:
             num_lines = self.max_lines_capture
-            
+
+        target = self._quote(f"{session_name}:{window_index}")
+        output = self._control_command(f"capture-pane -t {target} -p -S -{num_lines}")
+        if output is not None:
+            return output
+
+        cmd = ["tmux", "capture-pane", "-t", f"{session_name}:{window_index}", "-p", "-S", f"-{num_lines}"]
+        if streaming:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                    text=True, close_fds=False)
+            tail = deque(proc.stdout, maxlen=num_lines)
+            if proc.wait() != 0:
+                return f"Error capturing window content: tmux exited {proc.returncode}"
+            return ''.join(tail)
+
         try:
-            cmd = ["tmux", "capture-pane", "-t", f"{session_name}:{window_index}", "-p", "-S", f"-{num_lines}"]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            return result.stdout
+            return self._run_tmux(cmd[1:])
         except subprocess.CalledProcessError as e:
             return f"Error capturing window content: {e}"
     
-    def get_window_info(self, session_name: str, window_index: int) -> Dict:
-        """Get detailed information about a specific window"""
+    def get_window_metadata(self, session_name: str, window_index: int) -> Dict:
+        """Get window metadata (name, active, panes, layout, history size,
+        cursor position, foreground command) without capturing any pane
+        content"""
+        info_format = ("#{window_name}\x1f#{window_active}\x1f#{window_panes}\x1f#{window_layout}"
+                       "\x1f#{history_size}\x1f#{cursor_x}\x1f#{cursor_y}\x1f#{pane_current_command}")
         try:
-            cmd = ["tmux", "display-message", "-t", f"{session_name}:{window_index}", "-p", 
-                   "#{window_name}:#{window_active}:#{window_panes}:#{window_layout}"]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            
-            if result.stdout.strip():
-                parts = result.stdout.strip().split(':')
+            target = self._quote(f"{session_name}:{window_index}")
+            stdout = self._control_command(f"display-message -t {target} -p '{info_format}'")
+            if stdout is None:
+                stdout = self._run_tmux(["display-message", "-t", f"{session_name}:{window_index}", "-p", info_format])
+
+            parts = stdout.strip().split('\x1f', 7)
+            if len(parts) == 8 and parts[4].isdigit():
                 return {
                     "name": parts[0],
                     "active": parts[1] == '1',
                     "panes": int(parts[2]),
                     "layout": parts[3],
-                    "content": self.capture_window_content(session_name, window_index)
+                    "history_size": int(parts[4]),
+                    "cursor": (int(parts[5]), int(parts[6])),
+                    "current_command": parts[7]
                 }
+            # display-message can exit 0 with empty fields when the target
+            # vanished (e.g. session killed within the topology-cache TTL)
+            return {"error": f"Could not parse window info for {session_name}:{window_index}"}
         except subprocess.CalledProcessError as e:
             return {"error": f"Could not get window info: {e}"}
+
+    def get_window_info(self, session_name: str, window_index: int, num_lines: int = 50) -> Dict:
+        """Get detailed information about a specific window, including content"""
+        info = self.get_window_metadata(session_name, window_index)
+        if not info or "error" in info:
+            return info
+
+        # history_size alone misses visible-screen changes that never
+        # scroll (short sessions, full-screen TUIs), so the fingerprint
+        # also tracks the cursor and the foreground command
+        fingerprint = (info.pop("history_size"), info.pop("cursor"), info.pop("current_command"))
+        info["content"] = self._capture_if_changed(session_name, window_index, fingerprint, num_lines)
+        return info
+
+    def _capture_if_changed(self, session_name: str, window_index: int, fingerprint: Tuple, num_lines: int = 50) -> str:
+        """Capture window content, reusing the cached copy when the pane's
+        screen fingerprint hasn't changed since the last capture"""
+        key = (session_name, window_index)
+        cached = self._window_history.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        content = self.capture_window_content(session_name, window_index, num_lines)
+        self._window_history[key] = (fingerprint, content)
+        return content
     
     def send_keys_to_window(self, session_name: str, window_index: int, keys: str, confirm: bool = True) -> bool:
         """Safely send keys to a tmux window with confirmation"""
@@ -107,7 +300,10 @@ class TmuxOrchestrator:
         
         try:
             cmd = ["tmux", "send-keys", "-t", f"{session_name}:{window_index}", keys]
-            subprocess.run(cmd, check=True)
+            # close_fds=False lets CPython use posix_spawn instead of
+            # fork+exec, which is much cheaper for these short-lived clients
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=False, check=True)
+            self.invalidate_cache()
             return True
         except subprocess.CalledProcessError as e:
             print(f"Error sending keys: {e}")
@@ -115,90 +311,156 @@ class TmuxOrchestrator:
     
     def send_command_to_window(self, session_name: str, window_index: int, command: str, confirm: bool = True) -> bool:
         """Send a command to a window (adds Enter automatically)"""
-        # First send the command text
-        if not self.send_keys_to_window(session_name, window_index, command, confirm):
-            return False
-        # Then send the actual Enter key (C-m)
+        if self.safety_mode and confirm:
+            print(f"SAFETY CHECK: About to send '{command}' to {session_name}:{window_index}")
+            response = input("Confirm? (yes/no): ")
+            if response.lower() != 'yes':
+                print("Operation cancelled")
+                return False
+
+        # send-keys takes multiple key arguments, so the command text and the
+        # Enter key (C-m) go out in one tmux invocation
         try:
-            cmd = ["tmux", "send-keys", "-t", f"{session_name}:{window_index}", "C-m"]
-            subprocess.run(cmd, check=True)
+            cmd = ["tmux", "send-keys", "-t", f"{session_name}:{window_index}", command, "C-m"]
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=False, check=True)
+            self.invalidate_cache()
             return True
         except subprocess.CalledProcessError as e:
-            print(f"Error sending Enter key: {e}")
+            print(f"Error sending command: {e}")
             return False
     
-    def get_all_windows_status(self) -> Dict:
-        """Get status of all windows across all sessions"""
+    def send_commands_to_window(self, session_name: str, window_index: int, commands: List[str], confirm: bool = True) -> bool:
+        """Send multiple commands to a window in a single tmux invocation"""
+        if not commands:
+            return True
+
+        if self.safety_mode and confirm:
+            print(f"SAFETY CHECK: About to send {len(commands)} commands to {session_name}:{window_index}")
+            for command in commands:
+                print(f"  {command}")
+            response = input("Confirm? (yes/no): ")
+            if response.lower() != 'yes':
+                print("Operation cancelled")
+                return False
+
+        # Chain one send-keys per command with ';' separators so the whole
+        # batch costs a single tmux client invocation
+        cmd = ["tmux"]
+        for i, command in enumerate(commands):
+            if i > 0:
+                cmd.append(";")
+            cmd.extend(["send-keys", "-t", f"{session_name}:{window_index}", command, "C-m"])
+
+        try:
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=False, check=True)
+            self.invalidate_cache()
+            return True
+        except subprocess.CalledProcessError as e:
+            print(f"Error sending commands: {e}")
+            return False
+
+    def get_all_windows_status(self, include_content: bool = True) -> Dict:
+        """Get status of all windows across all sessions. Pass
+        include_content=False to skip pane captures and return metadata only"""
         sessions = self.get_tmux_sessions()
         status = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.now().isoformat(timespec='milliseconds'),
             "sessions": []
         }
-        
+
+        fetch = self.get_window_info if include_content else self.get_window_metadata
+
+        # Query every window concurrently - each call just blocks on tmux,
+        # so threads overlap the subprocess waits
+        all_windows = [(session.name, window) for session in sessions for window in session.windows]
+        if all_windows:
+            with ThreadPoolExecutor(max_workers=min(32, len(all_windows))) as executor:
+                infos = list(executor.map(lambda sw: fetch(sw[0], sw[1].window_index), all_windows))
+        else:
+            infos = []
+        window_infos = {(name, window.window_index): info for (name, window), info in zip(all_windows, infos)}
+
         for session in sessions:
             session_data = {
                 "name": session.name,
                 "attached": session.attached,
                 "windows": []
             }
-            
+
             for window in session.windows:
-                window_info = self.get_window_info(session.name, window.window_index)
                 window_data = {
                     "index": window.window_index,
                     "name": window.window_name,
                     "active": window.active,
-                    "info": window_info
+                    "info": window_infos[(session.name, window.window_index)]
                 }
                 session_data["windows"].append(window_data)
-            
+
             status["sessions"].append(session_data)
-        
+
         return status
     
     def find_window_by_name(self, window_name: str) -> List[Tuple[str, int]]:
         """Find windows by name across all sessions"""
-        sessions = self.get_tmux_sessions()
+        return self.find_windows_by_names([window_name])
+
+    def find_windows_by_names(self, window_names: List[str]) -> List[Tuple[str, int]]:
+        """Find windows matching any of several names in a single pass"""
+        if not window_names:
+            return []
+
+        # One compiled case-insensitive alternation scans each window name
+        # once instead of lowercasing both sides per needle
+        needles = re.compile("|".join(re.escape(name) for name in window_names), re.IGNORECASE)
         matches = []
-        
-        for session in sessions:
+
+        for session in self.get_tmux_sessions():
             for window in session.windows:
-                if window_name.lower() in window.window_name.lower():
+                if needles.search(window.window_name):
                     matches.append((session.name, window.window_index))
-        
+
         return matches
     
     def create_monitoring_snapshot(self) -> str:
         """Create a comprehensive snapshot for Claude analysis"""
         status = self.get_all_windows_status()
-        
-        # Format for Claude consumption
-        snapshot = f"Tmux Monitoring Snapshot - {status['timestamp']}\n"
-        snapshot += "=" * 50 + "\n\n"
-        
+
+        # Format for Claude consumption; collect pieces and join once rather
+        # than reallocating the growing snapshot on every +=
+        parts = [f"Tmux Monitoring Snapshot - {status['timestamp']}\n", _SNAPSHOT_HEADER]
+
         for session in status['sessions']:
-            snapshot += f"Session: {session['name']} ({'ATTACHED' if session['attached'] else 'DETACHED'})\n"
-            snapshot += "-" * 30 + "\n"
-            
+            parts.append(f"Session: {session['name']} ({'ATTACHED' if session['attached'] else 'DETACHED'})\n")
+            parts.append(_SESSION_SEP)
+
             for window in session['windows']:
-                snapshot += f"  Window {window['index']}: {window['name']}"
+                parts.append(f"  Window {window['index']}: {window['name']}")
                 if window['active']:
-                    snapshot += " (ACTIVE)"
-                snapshot += "\n"
-                
+                    parts.append(" (ACTIVE)")
+                parts.append("\n")
+
                 if 'content' in window['info']:
-                    # Get last 10 lines for overview
-                    content_lines = window['info']['content'].split('\n')
-                    recent_lines = content_lines[-10:] if len(content_lines) > 10 else content_lines
-                    snapshot += "    Recent output:\n"
+                    # Get last 10 lines for overview; rsplit with a maxsplit
+                    # leaves everything earlier as one unsplit chunk instead
+                    # of materializing a string per captured line
+                    recent_lines = window['info']['content'].rsplit('\n', 10)[-10:]
+                    parts.append("    Recent output:\n")
                     for line in recent_lines:
                         if line.strip():
-                            snapshot += f"    | {line}\n"
-                snapshot += "\n"
-        
-        return snapshot
+                            parts.append(f"    | {line}\n")
+                parts.append("\n")
+
+        return "".join(parts)
 
 if __name__ == "__main__":
     orchestrator = TmuxOrchestrator()
     status = orchestrator.get_all_windows_status()
-    print(json.dumps(status, indent=2))
\ No newline at end of file
+    try:
+        # orjson serializes large capture-laden snapshots several times
+        # faster than the stdlib; fall back when it isn't installed
+        import orjson
+        import sys
+        sys.stdout.buffer.write(orjson.dumps(status, option=orjson.OPT_INDENT_2) + b"\n")
+    except ImportError:
+        import json
+        print(json.dumps(status, indent=2))
\ No newline at end of file